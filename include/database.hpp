@@ -136,6 +136,13 @@ class ReplayDatabase
      */
     [[nodiscard]] auto size() const noexcept -> std::size_t;
 
+    /**
+     * @brief Read the number of entries of a database from its header without loading its look up table
+     * @param dbPath The path to the replay database.
+     * @return Number of entries in the database, zero if it couldn't be read
+     */
+    [[nodiscard]] static auto peekSize(const std::filesystem::path &dbPath) noexcept -> std::size_t;
+
     /**
      * @brief Return an set of hash+playerId entries in the database
      * @return Unordered set of std::string of concatenated hash and playerId
@@ -5,16 +5,17 @@ import os
 from typing_extensions import Annotated
 from pathlib import Path
 from sc2_replay_reader import Race, Result
-from typing import List, Any, Callable, Dict, Tuple
-from functools import reduce
+from typing import List, Any, Callable, Dict, Iterable, Tuple
 import matplotlib.pyplot as plt
+from utils import table_exists
 
 app = typer.Typer()
 TABLE_NAME = "game_data"
-
-
-def compose(*funcs):
-    return lambda x: reduce(lambda acc, f: f(acc), reversed(funcs), x)
+# Game steps per second * seconds per minute * 100
+GAME_LENGTH_SCALE = 22.4 * 60 * 100
+# Lookup of the stored (text) enum values, built once rather than converting per row
+RACE_BY_VALUE = {str(int(v)): v for v in Race.__members__.values()}
+RESULT_BY_VALUE = {str(int(v)): v for v in Result.__members__.values()}
 
 
 def get_races(cursor: sqlite3.Cursor):
@@ -53,89 +54,103 @@ def count_invalid(cursor: sqlite3.Cursor, valid_rows: int | None = None):
     game_steps = int(min_game_time_minutes * 60 * 22.4)
     invalid_criteria = [
         "playerMMR < 0",
-        "read_success = 0",
         "playerAPM < 0",
         "final_score_float < 0",
         f"game_length < {game_steps}",
     ]
     invalid_criteria.append(" OR ".join(invalid_criteria))
-    for ic in invalid_criteria:
-        query = f"""
-            SELECT COUNT(*) as count
-            FROM {TABLE_NAME}
-            WHERE {ic}
-            """
-        cursor.execute(query)
 
-        # Fetch the results
-        results = cursor.fetchone()
+    # Count every criteria in a single pass over the table
+    counts = ", ".join(f"COUNT(CASE WHEN {ic} THEN 1 END)" for ic in invalid_criteria)
+    query = f"""
+        SELECT {counts}
+        FROM {TABLE_NAME}
+        """
+    cursor.execute(query)
+
+    # Fetch the results
+    results = cursor.fetchone()
 
+    for ic, count in zip(invalid_criteria, results):
         if valid_rows is not None:
             typer.echo(
-                f"Invalid rows ({ic}): {results[0]:,} ({results[0] * 100 / valid_rows:.2f}%)"
+                f"Invalid rows ({ic}): {count:,} ({count * 100 / valid_rows:.2f}%)"
             )
         else:
-            typer.echo(f"Invalid rows ({ic}): {results[0]:,}")
+            typer.echo(f"Invalid rows ({ic}): {count:,}")
+
+    # Replays that couldn't be read aren't in the main table, databases made before
+    # failures were recorded separately don't have the table at all
+    if table_exists(cursor, "game_failures"):
+        cursor.execute("SELECT COUNT(*) FROM game_failures")
+        typer.echo(f"Failed reads: {cursor.fetchone()[0]:,}")
+    else:
+        typer.echo("Failed reads: no game_failures table")
+
+
+def write_dat(path: Path | str, values: Iterable[float]):
+    """Stream values to a .dat file, one per line under an "A" header"""
+    with open(path, "w") as out:
+        out.write("A\n")
+        out.writelines(f"{v}\n" for v in values)
 
 
 def race_match_length(cursor: sqlite3.Cursor):
+    # Same statement text for every pair, so sqlite reuses the prepared statement
+    query = f"""
+        SELECT game_length / {GAME_LENGTH_SCALE}
+        FROM {TABLE_NAME}
+        WHERE playerRace IN (?, ?)
+        GROUP BY replayHash
+        HAVING COUNT(DISTINCT playerRace) = ?
+            AND COUNT(*) = 2;
+        """
+
     def _race_match_length(race1: int, race2: int):
-        query = f"""
-            SELECT game_length
-            FROM {TABLE_NAME}
-            WHERE playerRace IN ({race1}, {race2})
-            GROUP BY replayHash
-            HAVING COUNT(DISTINCT playerRace) = {len(set((race1,race2)))}
-                AND COUNT(*) = 2;
-            """
-        cursor.execute(query)
-        results = [x[0] / 22.4 / 60 / 100 for x in cursor.fetchall()]
-        return results
+        cursor.execute(query, (race1, race2, len(set((race1, race2)))))
+        return (x[0] for x in cursor)
 
     for r1 in range(3):
         for r2 in range(r1, 3):
-            output = _race_match_length(cursor, r1, r2)
-            with open(f"{r1}_{r2}.dat", "w") as out:
-                out.write("A\n")
-                out.write("\n".join(map(str, output)))
+            output = _race_match_length(r1, r2)
+            write_dat(f"{r1}_{r2}.dat", output)
 
 
 def racevsrace_length(cursor: sqlite3.Cursor):
+    query = f"""
+    SELECT game_length / {GAME_LENGTH_SCALE}
+    FROM {TABLE_NAME}
+    WHERE (playerRace = ? AND playerResult = {int(Result.Win)})
+           OR (playerRace = ? AND playerResult = {int(Result.Loss)})
+    GROUP BY replayHash
+    HAVING COUNT(DISTINCT playerRace) = ?
+    AND COUNT(*) = 2;
+    """
+
     def _racevsrace_length(winning_race: int, losing_race: int):
-        query = f"""
-        SELECT game_length
-        FROM {TABLE_NAME}
-        WHERE (playerRace = {winning_race} AND playerResult = {int(Result.Win)})
-               OR (playerRace = {losing_race} AND playerResult = {int(Result.Loss)})
-        GROUP BY replayHash
-        HAVING COUNT(DISTINCT playerRace) = {len(set((winning_race,losing_race)))}
-        AND COUNT(*) = 2;
-        """
-        cursor.execute(query)
-        results = [x[0] / 22.4 / 60 / 100 for x in cursor.fetchall()]
-        return results
+        n_races = len(set((winning_race, losing_race)))
+        cursor.execute(query, (winning_race, losing_race, n_races))
+        return (x[0] for x in cursor)
 
     numbers = [int(x) for x in Result.__members__.values()]
     result = [(num1, num2) for num1 in numbers for num2 in numbers if num1 != num2]
 
     for c in result:
         output = _racevsrace_length(*c)
-        with open(f"verse/verse_{c[0]}_{c[1]}.dat", "w") as out:
-            out.write("A\n")
-            out.write("\n".join(map(str, output)))
+        write_dat(f"verse/verse_{c[0]}_{c[1]}.dat", output)
 
 
 def racewin(cursor: sqlite3.Cursor):
+    query = f"""
+    SELECT game_length / {GAME_LENGTH_SCALE}
+    FROM {TABLE_NAME}
+    WHERE (playerRace = ? AND playerResult = ?)
+    GROUP BY replayHash
+    """
+
     def _racewin(winning_race: int):
-        query = f"""
-        SELECT game_length
-        FROM {TABLE_NAME}
-        WHERE (playerRace = {winning_race} AND playerResult = {int(Result.Win)})
-        GROUP BY replayHash
-        """
-        cursor.execute(query)
-        results = [x[0] / 22.4 / 60 / 100 for x in cursor.fetchall()]
-        return results
+        cursor.execute(query, (winning_race, int(Result.Win)))
+        return (x[0] for x in cursor)
 
     output_folder = Path("win")
     os.makedirs(output_folder, exist_ok=True)
@@ -143,92 +158,105 @@ def racewin(cursor: sqlite3.Cursor):
     for c in Result.__members__.values():
         output = _racewin(int(c))
 
-        with open(output_folder / f"win_lengths_{int(c)}.dat", "w") as out:
-            out.write("A\n")
-            out.write("\n".join(map(str, output)))
+        write_dat(output_folder / f"win_lengths_{int(c)}.dat", output)
 
 
 def apm_per_race(cursor: sqlite3.Cursor):
+    query = f"""
+    SELECT playerAPM / 1000.0
+    FROM {TABLE_NAME}
+    WHERE playerRace = ? and playerAPM > 0
+    """
+
     def _apm_per_race(winning_race: int):
-        query = f"""
-        SELECT playerAPM
-        FROM {TABLE_NAME}
-        WHERE playerRace = {winning_race} and playerAPM > 0
-        """
-        cursor.execute(query)
-        results = [x[0] / 1000 for x in cursor.fetchall()]
-        return results
+        cursor.execute(query, (winning_race,))
+        return (x[0] for x in cursor)
 
     output_folder = Path("apm")
     os.makedirs(output_folder, exist_ok=True)
 
     for c in Result.__members__.values():
         output = _apm_per_race(int(c))
-        with open(output_folder / f"apm_per_race_{int(c)}.dat", "w") as out:
-            out.write("A\n")
-            out.write("\n".join(map(str, output)))
+        write_dat(output_folder / f"apm_per_race_{int(c)}.dat", output)
 
 
 def count_discrete_values(
     cursor: sqlite3.Cursor,
-    columns: Dict[str, Tuple[List[Any], Callable[[str], Any] | None]],
+    *column_sets: Dict[str, Tuple[List[Any], Callable[[str], Any] | None]],
 ):
-    def convert(k, v):
-        return f"{k} in ({','.join([str(i) for i in v[0]])})"
+    """
+    Count the occurrences of each combination of values for every set of columns.
+    The table is scanned once, grouping by all the columns used by any set, then
+    those counts are filtered and summed down to each individual set of columns.
+    """
+    all_columns = list(dict.fromkeys(k for columns in column_sets for k in columns))
 
     query = f"""
-            SELECT {", ".join(columns.keys())}, COUNT(*) as count
+            SELECT {", ".join(all_columns)}, COUNT(*) as count
             FROM {TABLE_NAME}
-            WHERE {" AND ".join(convert(k,v) for k,v in columns.items())}
-            GROUP BY {", ".join(columns.keys())}
+            GROUP BY {", ".join(all_columns)}
         """
     cursor.execute(query)
 
     # Fetch the results
     results = cursor.fetchall()
 
-    for row in results:
-        # Extract column values and count from the row
-        values = row[:-1]
-        count = row[-1]
-
-        # Format and print the output dynamically
-        formatted_values = ", ".join(
-            f"{k}: {v[1](str(val)) if v[1] is not None else val}"
-            for (k, v), val in zip(columns.items(), values)
-        )
+    for columns in column_sets:
+        indices = [all_columns.index(k) for k in columns]
+        # Compare as strings as the enums are stored in TEXT columns
+        allowed = [{str(i) for i in v[0]} for v in columns.values()]
+        counts: Dict[Tuple[Any, ...], int] = {}
+        for row in results:
+            # Extract column values of this set and filter to the requested values
+            values = tuple(row[i] for i in indices)
+            if all(str(val) in a for a, val in zip(allowed, values)):
+                counts[values] = counts.get(values, 0) + row[-1]
+
+        for values, count in sorted(counts.items()):
+            # Format and print the output dynamically
+            formatted_values = ", ".join(
+                f"{k}: {v[1](str(val)) if v[1] is not None else val}"
+                for (k, v), val in zip(columns.items(), values)
+            )
 
-        typer.echo(f"{formatted_values}, Count: {count} occurrences")
+            typer.echo(f"{formatted_values}, Count: {count} occurrences")
 
 
-def mad(data):
-    median = np.median(data)
-    diff = np.abs(data - median)
-    mad = np.median(diff)
-    return mad
+def mad(data, median=None):
+    if median is None:
+        median = np.median(data)
+    # Reuse one buffer for the deviations and let median partition it in place
+    diff = np.subtract(data, median)
+    np.abs(diff, out=diff)
+    return np.median(diff, overwrite_input=True)
 
 
 def calculate_bounds(data, z_thresh=3.5):
-    MAD = mad(data)
     median = np.median(data)
+    MAD = mad(data, median)
     const = z_thresh * MAD / 0.6745
     return (median - const, median + const)
 
 
 def outlier_aware_hist(data, lower=None, upper=None):
-    if not lower or lower < data.min():
-        lower = data.min()
+    data_min, data_max = data.min(), data.max()
+
+    if not lower or lower < data_min:
+        lower = data_min
         lower_outliers = False
     else:
         lower_outliers = True
 
-    if not upper or upper > data.max():
-        upper = data.max()
+    if not upper or upper > data_max:
+        upper = data_max
         upper_outliers = False
     else:
         upper_outliers = True
 
-    n, bins, patches = plt.hist(data, range=(lower, upper), density=True, bins=100)
+    # Uniform bins over a fixed range keep numpy on its linear time binning path
+    counts, bins = np.histogram(data, bins=100, range=(lower, upper))
+    n = counts / (counts.sum() * np.diff(bins))
+    patches = plt.bar(bins[:-1], n, width=np.diff(bins), align="edge")
 
     csv_data = np.column_stack((bins[:-1], bins[1:], n))
     np.savetxt(
@@ -240,19 +268,19 @@ def outlier_aware_hist(data, lower=None, upper=None):
     )
 
     if lower_outliers:
-        n_lower_outliers = (data < lower).sum()
+        n_lower_outliers = np.count_nonzero(data < lower)
         patches[0].set_height(patches[0].get_height() + n_lower_outliers)
         patches[0].set_facecolor("c")
         patches[0].set_label(
-            "Lower outliers: ({:.2f}, {:.2f})".format(data.min(), lower)
+            "Lower outliers: ({:.2f}, {:.2f})".format(data_min, lower)
         )
 
     if upper_outliers:
-        n_upper_outliers = (data > upper).sum()
+        n_upper_outliers = np.count_nonzero(data > upper)
         patches[-1].set_height(patches[-1].get_height() + n_upper_outliers)
         patches[-1].set_facecolor("m")
         patches[-1].set_label(
-            "Upper outliers: ({:.2f}, {:.2f})".format(upper, data.max())
+            "Upper outliers: ({:.2f}, {:.2f})".format(upper, data_max)
         )
 
     if lower_outliers or upper_outliers:
@@ -262,9 +290,9 @@ def outlier_aware_hist(data, lower=None, upper=None):
 
 def plot_game_lengths(cursor):
     cursor.execute(f"SELECT game_length FROM {TABLE_NAME}")
-    game_lengths = [x[0] / 22.4 for x in cursor.fetchall()]
+    data = np.fromiter((x[0] for x in cursor), dtype=np.float64)
+    data /= 22.4
 
-    data = np.array(game_lengths)
     upper = outlier_aware_hist(data, *calculate_bounds(data))
 
     # Set x ticks every 60 units, up to 600
@@ -288,49 +316,32 @@ def get_column_diff(cursor: sqlite3.Cursor, column: str):
     - column (str): Name of the column for which the difference is to be calculated.
 
     The function performs the following steps:
-    1. Retrieves data from the specified column and playerResult from the given table where:
-       - replayHash is common in both rows.
-       - playerMMR > 0 and playerAPM > 0 for both rows.
-       - Groups the data by replayHash and selects rows where playerResult is 0 or 1.
-       - Sorted ascending to ensure, 'Win' is the first value (0)
-    2. Constructs a subquery to calculate APM_Difference by subtracting the two values
-    3. Normalizes the APM_Difference values.
+    1. Selects the rows where playerMMR > 0 and playerAPM > 0.
+    2. Joins the winning row (playerResult 0) of each replayHash with its losing
+       row (playerResult 1) and subtracts the loser's value from the winner's.
+    3. Normalizes the differences.
     4. Writes the normalized values to a file in a specific format.
     """
     query = f"""
-    WITH Subquery AS (
-        SELECT replayHash,
-            GROUP_CONCAT({column}) AS APM,
-            GROUP_CONCAT(playerResult) AS Result,
-            SUBSTR(GROUP_CONCAT({column}), 0, INSTR(GROUP_CONCAT({column}), ',')) AS open,
-            SUBSTR(GROUP_CONCAT({column}), INSTR(GROUP_CONCAT({column}), ',')+1) AS close
-        FROM (
-            SELECT replayHash, {column}, playerResult
-            FROM {TABLE_NAME}
-            WHERE replayHash IN (
-                SELECT replayHash
-                FROM {TABLE_NAME}
-                WHERE playerMMR > 0 AND playerAPM > 0
-                GROUP BY replayHash
-                HAVING COUNT(*) = 2
-            )
-            ORDER BY playerResult ASC
-        )
-        GROUP BY replayHash
-        HAVING playerResult IN (0, 1)
+    WITH Valid AS (
+        SELECT replayHash, {column}, playerResult
+        FROM {TABLE_NAME}
+        WHERE playerMMR > 0 AND playerAPM > 0
     )
-    SELECT (open - close) AS APM_Difference
-    FROM Subquery;
+    SELECT win.{column} - loss.{column} AS Difference
+    FROM Valid AS win
+    JOIN Valid AS loss ON win.replayHash = loss.replayHash
+    WHERE win.playerResult = 0 AND loss.playerResult = 1;
     """
 
     cursor.execute(query)
-    output = [x[0] for x in cursor.fetchall()]
-    normal_value = max([abs(x) for x in output]) * 5
-    output = [x / normal_value for x in output]
+    output = np.fromiter((x[0] for x in cursor), dtype=np.float64)
+    normal_value = float(np.abs(output).max()) * 5
+    output /= normal_value
 
-    with open(f"{column}_{normal_value}.dat", "w") as out:
-        out.write("A\n")
-        out.write("\n".join(map(str, output)))
+    np.savetxt(
+        f"{column}_{normal_value}.dat", output, fmt="%.17g", header="A", comments=""
+    )
 
 
 def generate_scatter(
@@ -346,12 +357,12 @@ def generate_scatter(
         query += f" WHERE {column_y} {y_filter}"
 
     cursor.execute(query)
-    data = cursor.fetchall()
-    y_vals, x_vals = zip(*data)
+    # Read straight into columns rather than building a list of row tuples
+    data = np.fromiter(cursor, dtype=[("y", np.float64), ("x", np.float64)])
 
     # Create a scatter plot
     plt.figure(figsize=(10, 6))
-    plt.scatter(y_vals, x_vals, alpha=0.5, color="green", edgecolors="black")
+    plt.scatter(data["y"], data["x"], alpha=0.5, color="green", edgecolors="black")
 
     # Set labels and title
     plt.title(f"Scatter Plot of {column_y} vs {column_x}")
@@ -369,6 +380,12 @@ def main(database: Annotated[Path, typer.Option()]):
     try:
         conn = sqlite3.connect(database_str)
         cursor = conn.cursor()
+        # Analysis is read-only full scans, memory map the file and give sqlite
+        # a large page cache and in-memory temp storage for the GROUP BYs
+        cursor.execute("PRAGMA query_only=1")
+        cursor.execute("PRAGMA mmap_size=30000000000")
+        cursor.execute("PRAGMA cache_size=-262144")
+        cursor.execute("PRAGMA temp_store=MEMORY")
 
         get_column_diff(cursor, "playerAPM")
         get_column_diff(cursor, "playerMMR")
@@ -379,23 +396,20 @@ def main(database: Annotated[Path, typer.Option()]):
         count_invalid(cursor, rows)
         plot_game_lengths(cursor)
 
-        count_discrete_values(cursor, {"playerRace": ([0, 1, 2], compose(Race, int))})
-        count_discrete_values(
-            cursor,
-            {"playerRace": ([0, 1, 2], compose(Race, int)), "playerId": ([1, 2], None)},
-        )
         count_discrete_values(
             cursor,
+            {"playerRace": ([0, 1, 2], RACE_BY_VALUE.__getitem__)},
             {
-                "playerRace": ([0, 1, 2], compose(Race, int)),
-                "playerResult": ([0, 1], compose(Result, int)),
+                "playerRace": ([0, 1, 2], RACE_BY_VALUE.__getitem__),
+                "playerId": ([1, 2], None),
+            },
+            {
+                "playerRace": ([0, 1, 2], RACE_BY_VALUE.__getitem__),
+                "playerResult": ([0, 1], RESULT_BY_VALUE.__getitem__),
             },
-        )
-        count_discrete_values(
-            cursor,
             {
                 "playerId": ([1, 2], None),
-                "playerResult": ([0, 1], compose(Result, int)),
+                "playerResult": ([0, 1], RESULT_BY_VALUE.__getitem__),
             },
         )
         generate_scatter(cursor, "playerMMR", "game_length", x_filter="> 0")
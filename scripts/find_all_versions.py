@@ -1,8 +1,10 @@
 import io
 import json
+from multiprocessing import Pool
 import mpyq
 from pathlib import Path
 import typer
+from tqdm import tqdm
 from typing_extensions import Annotated
 
 app = typer.Typer()
@@ -14,12 +16,17 @@ def replay_data(replay_path: str):
         return f.read()
 
 
+def read_metadata(replay_data: bytes):
+    """Decompress and parse only the game metadata from the replay archive"""
+    archive = mpyq.MPQArchive(io.BytesIO(replay_data), listfile=False)
+    metadata = archive.read_file(b"replay.gamemetadata.json")
+    if metadata is None:
+        raise KeyError("replay.gamemetadata.json")
+    return json.loads(metadata.decode("utf-8"))
+
+
 def get_replay_version(replay_data):
-    replay_io = io.BytesIO()
-    replay_io.write(replay_data)
-    replay_io.seek(0)
-    archive = mpyq.MPQArchive(replay_io).extract()
-    metadata = json.loads(archive[b"replay.gamemetadata.json"].decode("utf-8"))
+    metadata = read_metadata(replay_data)
     game_version = ".".join(metadata["GameVersion"].split(".")[:-1])
     data_version = metadata.get("DataVersion")  # Only in replays version 4.1+.
     build_version = str(metadata["BaseBuild"][4:])
@@ -29,11 +36,7 @@ def get_replay_version(replay_data):
 
 def get_all_versions(replay_data):
     try:
-        replay_io = io.BytesIO()
-        replay_io.write(replay_data)
-        replay_io.seek(0)
-        archive = mpyq.MPQArchive(replay_io).extract()
-        metadata = json.loads(archive[b"replay.gamemetadata.json"].decode("utf-8"))
+        metadata = read_metadata(replay_data)
         game_version = ".".join(metadata["GameVersion"].split(".")[:-1])
         data_version = metadata.get("DataVersion")  # Only in replays version 4.1+.
         build_version = int(metadata["BaseBuild"][4:])
@@ -52,6 +55,11 @@ def run_file(file_path: str):
     return get_replay_version(replay_data(file_path))
 
 
+def get_file_versions(file_path: Path):
+    """Read and parse the versions of a replay file, run in a worker process"""
+    return file_path, get_all_versions(file_path.read_bytes())
+
+
 @app.command()
 def main(
     replay_paths: Annotated[Path, typer.Option()],
@@ -59,16 +67,25 @@ def main(
 ):
     all_versions = set()
 
-    current_bases = set(game_paths.glob("*"))
+    # Game folders may be named by build number with or without a "Base" prefix
+    current_bases = {p.name.removeprefix("Base") for p in game_paths.iterdir()}
 
     games = []
     missing_versions = []
-    for i in replay_paths.rglob("*.SC2Replay"):
-        versions = get_all_versions(replay_data(i))
-        if versions is not None:
+    replay_files = list(replay_paths.rglob("*.SC2Replay"))
+    # Reading and decompressing the replay archives is independent per file,
+    # results are handled as they complete so a slow replay doesn't stall the rest
+    with Pool() as pool, tqdm(total=len(replay_files)) as pbar:
+        for i, versions in pool.imap_unordered(
+            get_file_versions, replay_files, chunksize=64
+        ):
+            pbar.update(1)
+            if versions is None:
+                continue
+
             if str(versions[2]) not in current_bases:
                 missing_versions.append([i, *versions])
-                current_bases.append(str(versions[2]))
+                current_bases.add(str(versions[2]))
 
             if versions not in all_versions:
                 games.append([i, *versions])
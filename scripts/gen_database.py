@@ -1,9 +1,8 @@
 import os
 import sqlite3
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 
-import torch
 import typer
 from torch.utils.data import DataLoader
 from tqdm import tqdm
@@ -14,26 +13,32 @@ from summaryStats import SQL_TYPES, LambdaFunctionType, SC2Replay
 
 app = typer.Typer()
 
+# Fields of Score, each is written as a final_* column
+SCORE_ATTRIBUTES = tuple(
+    attr
+    for attr in dir(Score)
+    if not callable(getattr(Score, attr))
+    if "__" not in attr
+)
+# Columns that are known for a replay that failed to be read
+FAILED_COLUMNS = ("partition", "idx", "playerId", "replayHash")
 
-def custom_collate(batch):
-    # No read success in entire batch
-    if not any(item["read_success"] for item in batch):
-        raise Exception(
-            f"Nothing successful in entire batch of length {len(batch)}, try making it larger"
-        )
-    if all(item["read_success"] for item in batch):
-        return torch.utils.data.dataloader.default_collate(batch)
-
-    first_read_success = next((item for item in batch if item.get("read_success")))
-    extra_keys = set(first_read_success.keys()) - {"partition", "idx", "read_success"}
 
-    # Create a dictionary with zero tensors for extra_keys
-    empty_batch = {key: 0 for key in extra_keys}
-    data_batch = [
-        {**empty_batch, **data} if not data["read_success"] else data for data in batch
+def custom_collate(batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Collate the successful reads into lists of python values, the batch only goes
+    to sqlite so there is no point in packing it into tensors just to unpack it
+    again. Failed reads are kept separately as rows of FAILED_COLUMNS for the
+    game_failures table.
+    """
+    good = [item for item in batch if item["read_success"]]
+    failed = [
+        tuple(item.get(key) for key in FAILED_COLUMNS)
+        for item in batch
+        if not item["read_success"]
     ]
-
-    return torch.utils.data.dataloader.default_collate(data_batch)
+    columns = {key: [item[key] for item in good] for key in good[0]} if good else {}
+    return {"good": columns, "failed": failed}
 
 
 def make_database(
@@ -41,11 +46,35 @@ def make_database(
     additional_columns: Dict[str, SQL_TYPES],
     features: Dict[str, SQL_TYPES],
     lambda_columns: Dict[str, Tuple[SQL_TYPES, LambdaFunctionType]],
+    score_columns: Dict[str, str],
+    unsafe: bool = False,
 ):
-    if path.exists():
-        os.remove(path)
+    """
+    Create a new database at path with a game_data table for the given columns.
+    The connection reads through mmap, which speeds up building the indexes at the
+    end, note that mmap_size is per-connection so readers have to set it themselves.
+    """
+    # A stale WAL left by a crashed run could be replayed into the new database
+    for suffix in ("", "-wal", "-shm"):
+        stale = path.with_name(path.name + suffix)
+        if stale.exists():
+            os.remove(stale)
     # Connect to the SQLite database (creates a new database if it doesn't exist)
-    conn = sqlite3.connect(str(path))
+    # Transactions are managed explicitly by the bulk load rather than by the module
+    conn = sqlite3.connect(str(path), isolation_level=None)
+    # Page size has to be set before anything is written to the new file
+    conn.execute("PRAGMA page_size=8192")
+    if unsafe:
+        # One-shot build, a crash mid-way means regenerating the file anyway
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+    else:
+        # WAL with relaxed syncing avoids an fsync on every commit of the bulk load
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-262144")
+    conn.execute("PRAGMA mmap_size=30000000000")
 
     # Create a cursor object to execute SQL commands
     cursor = conn.cursor()
@@ -55,35 +84,58 @@ def make_database(
         CREATE TABLE game_data (
             {', '.join(f"{column} {datatype}" for column, datatype in additional_columns.items())},
             {', '.join(f"{column} {datatype}" for column, datatype in features.items())},
-            {', '.join(f"{column} {datatype}" for column, (datatype, _) in lambda_columns.items())}
-        )
+            {', '.join(f"{column} {datatype}" for column, (datatype, _) in lambda_columns.items())},
+            {', '.join(f"{column} FLOAT" for column in score_columns)},
+            PRIMARY KEY (partition, idx)
+        ) WITHOUT ROWID
     """
     cursor.execute(create_table_sql)
-    return conn, cursor
 
+    # Replays that failed to be read are recorded in their own table
+    create_failures_sql = """
+        CREATE TABLE game_failures (
+            partition TEXT,
+            idx INTEGER,
+            playerId INTEGER,
+            replayHash TEXT,
+            PRIMARY KEY (partition, idx)
+        ) WITHOUT ROWID
+    """
+    cursor.execute(create_failures_sql)
 
-def close_database(conn: sqlite3.Connection):
-    # Commit the changes and close the connection
-    conn.commit()
-    conn.close()
+    # Build the insert statement once, rows are then given in this column order
+    columns = [*additional_columns, *features, *lambda_columns, *score_columns]
+    insert_sql = f"""
+        INSERT INTO game_data ({", ".join(columns)})
+        VALUES ({", ".join("?" * len(columns))})
+    """
+    return conn, cursor, columns, insert_sql
 
 
-def add_to_database(cursor: sqlite3.Cursor, data_dict: Dict[str, Any]):
-    columns = ", ".join(data_dict.keys())
-    placeholders = ", ".join("?" for _ in data_dict.values())
+def index_database(cursor: sqlite3.Cursor):
+    """Index the columns the analysis scripts join, filter and group by"""
+    indexes = {
+        "idx_hash_result": "replayHash, playerResult",
+        "idx_race_result": "playerRace, playerResult",
+    }
+    for name, columns in indexes.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON game_data({columns})")
+    # Gather statistics so the query planner knows when to use the indexes
+    cursor.execute("ANALYZE game_data")
 
-    query = f"""
-        INSERT INTO game_data ({columns})
-        VALUES ({placeholders})
-    """
 
-    cursor.execute(query, tuple(data_dict.values()))
+def close_database(conn: sqlite3.Connection):
+    # The load commits its own transactions, so only the close is left to do
+    conn.close()
 
 
 @app.command()
 def main(
     workspace: Annotated[Path, typer.Option()] = Path("."),
     workers: Annotated[int, typer.Option()] = 0,
+    unsafe: Annotated[
+        bool, typer.Option(help="Disable the journal, faster but not crash safe")
+    ] = False,
 ):
     features: Dict[str, SQL_TYPES] = {
         "replayHash": "TEXT",
@@ -98,27 +150,13 @@ def main(
     additional_columns: Dict[str, SQL_TYPES] = {
         "partition": "TEXT",
         "idx": "INTEGER",
-        "read_success": "BOOLEAN",
     }
 
-    all_attributes = [
-        attr
-        for attr in dir(Score)
-        if not callable(getattr(Score, attr))
-        if "__" not in attr
-    ]
-
     lambda_columns: Dict[str, Tuple[SQL_TYPES, LambdaFunctionType]] = {
-        "max_units": ("TEXT", lambda y: max(len(x) for x in y.data.units)),
+        "max_units": ("TEXT", lambda y: max(map(len, y.data.units))),
         "game_length": ("INTEGER", lambda y: (y.data.gameStep[-1])),
-        **{
-            f"final_{i}": (
-                "FLOAT",
-                (lambda k: lambda y, key=k: float(getattr(y.data.score[-1], key)))(i),
-            )
-            for i in all_attributes
-        },
     }
+    score_columns = {f"final_{i}": i for i in SCORE_ATTRIBUTES}
 
     if "POD_NAME" in os.environ:
         number = os.environ["POD_NAME"].split("-")[-1]
@@ -126,6 +164,7 @@ def main(
             Path(os.environ["DATAPATH"]) / f"db_{number}.SC2Replays",
             set(features.keys()),
             lambda_columns,
+            score_columns,
         )
         db_file = workspace / f"gamedata_{number}.db"
         if db_file.is_file():
@@ -138,41 +177,78 @@ def main(
                 print("skipping file which exists....")
                 return
 
-        conn, cursor = make_database(
+        conn, cursor, columns, insert_sql = make_database(
             workspace / f"gamedata_{number}.db",
             additional_columns,
             features,
             lambda_columns,
+            score_columns,
+            unsafe,
         )
 
     else:
         dataset = SC2Replay(
-            Path(os.environ["DATAPATH"]), set(features.keys()), lambda_columns
+            Path(os.environ["DATAPATH"]),
+            set(features.keys()),
+            lambda_columns,
+            score_columns,
         )
-        conn, cursor = make_database(
-            workspace / "gamedata.db", additional_columns, features, lambda_columns
+        conn, cursor, columns, insert_sql = make_database(
+            workspace / "gamedata.db",
+            additional_columns,
+            features,
+            lambda_columns,
+            score_columns,
+            unsafe,
         )
 
     batch_size = 50
+    # Keep a few batches in flight per worker so parsing overlaps the inserts,
+    # pinned memory is left off as the batches never go to a GPU
+    loader_kwargs = {"prefetch_factor": 4} if workers > 0 else {}
     dataloader = DataLoader(
-        dataset, num_workers=workers, batch_size=batch_size, collate_fn=custom_collate
+        dataset,
+        num_workers=workers,
+        batch_size=batch_size,
+        collate_fn=custom_collate,
+        pin_memory=False,
+        **loader_kwargs,
     )
-    for idx, d in tqdm(enumerate(dataloader), total=len(dataloader)):
-        keys = d.keys()
-        for index in range(len(d["partition"])):
-            converted_d = {}
-            for key in keys:
-                value = d[key]
-
-                if isinstance(value, torch.Tensor):
-                    converted_d[key] = value[index].item()
-                elif isinstance(value, list):
-                    converted_d[key] = value[index]
-
-            add_to_database(cursor, converted_d)
-
-        if idx % 5 == 0:
-            conn.commit()
+    # Hold the write lock for the whole load and only commit once enough rows have
+    # accumulated rather than paying a sync every few batches
+    insert_every = 1000
+    commit_every = 10000
+    buffer: List[Tuple[Any, ...]] = []
+    failed_sql = f"""
+        INSERT INTO game_failures ({", ".join(FAILED_COLUMNS)})
+        VALUES ({", ".join("?" * len(FAILED_COLUMNS))})
+    """
+    uncommitted = 0
+    cursor.execute("BEGIN IMMEDIATE")
+    for d in tqdm(dataloader, total=len(dataloader)):
+        # Failures only go to their own table, game_data only holds complete rows
+        if d["failed"]:
+            cursor.executemany(failed_sql, d["failed"])
+        if d["good"]:
+            buffer.extend(zip(*(d["good"][k] for k in columns)))
+        if len(buffer) < insert_every:
+            continue
+
+        cursor.executemany(insert_sql, buffer)
+        uncommitted += len(buffer)
+        buffer.clear()
+        if uncommitted >= commit_every:
+            cursor.execute("COMMIT")
+            cursor.execute("BEGIN IMMEDIATE")
+            uncommitted = 0
+
+    if buffer:
+        cursor.executemany(insert_sql, buffer)
+    cursor.execute("COMMIT")
+
+    # Indexes are built once at the end, rather than updated on every insert
+    index_database(cursor)
+    close_database(conn)
 
 
 if __name__ == "__main__":
@@ -4,8 +4,11 @@ Use PySC2 and run over each game version in a folder and write out
 information about different upgrades.
 """
 import os
-from dataclasses import dataclass, field, asdict
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from types import MappingProxyType
 from typing import Iterable, Mapping
 
 from absl import flags
@@ -13,13 +16,16 @@ from absl import app
 import yaml
 from pysc2 import maps
 from pysc2.env import sc2_env
+from pysc2.lib import static_data
 from pysc2.lib.actions import FUNCTIONS
+from pysc2.lib.remote_controller import ConnectError
+from pysc2.lib.sc_process import SC2LaunchError
 from pysc2.run_configs.platforms import Linux as SC2Linux
 from s2clientprotocol import sc2api_pb2 as sc_pb
 from s2clientprotocol.data_pb2 import UpgradeData, AbilityData
 
 
-@dataclass
+@dataclass(slots=True)
 class Unit:
     uid: int
     name: str
@@ -29,7 +35,7 @@ class Unit:
     food: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Upgrade:
     uid: int
     ability_id: int
@@ -49,6 +55,20 @@ class GameInfo:
     upgrades: list[Upgrade] = field(default_factory=list)
 
 
+def slots_to_dict(obj: Unit | Upgrade):
+    """Shallow conversion of a slotted dataclass of primitives"""
+    return {name: getattr(obj, name) for name in obj.__slots__}
+
+
+def game_info_to_dict(game_info: GameInfo):
+    """Units and upgrades only hold primitives, so a shallow conversion suffices"""
+    return {
+        "version": game_info.version,
+        "units": [slots_to_dict(u) for u in game_info.units],
+        "upgrades": [slots_to_dict(u) for u in game_info.upgrades],
+    }
+
+
 def make_creation_msg(game) -> sc_pb.RequestCreateGame:
     create = sc_pb.RequestCreateGame(realtime=False, disable_fog=False)
     create.player_setup.add(type=sc_pb.Participant)
@@ -68,9 +88,18 @@ def make_interface_opts():
     return sc_pb.InterfaceOptions()
 
 
-FUNCTIONS_BY_ID = {
-    f.ability_id: f.name[len("Research_") : -len("_quick")] for f in list(FUNCTIONS)
-}
+# Words dropped from an ability's friendly name to get the upgrade name
+_FRIENDLY_NAME_RE = re.compile(r"Research|Evolve")
+
+_RESEARCH_PREFIX, _RESEARCH_SUFFIX = "Research_", "_quick"
+# Only research functions are looked up, others would just have garbled names
+FUNCTIONS_BY_ID = MappingProxyType(
+    {
+        f.ability_id: f.name[len(_RESEARCH_PREFIX) : -len(_RESEARCH_SUFFIX)]
+        for f in FUNCTIONS
+        if f.name.startswith(_RESEARCH_PREFIX) and f.name.endswith(_RESEARCH_SUFFIX)
+    }
+)
 
 
 def parse_upgrades(upgrades, abilities):
@@ -79,10 +108,7 @@ def parse_upgrades(upgrades, abilities):
 
     for upgrade in upgrades:
         ability = abilities[upgrade.ability_id]
-        try:
-            pysc2_name = FUNCTIONS_BY_ID[upgrade.ability_id]
-        except KeyError:
-            pysc2_name = ""
+        pysc2_name = FUNCTIONS_BY_ID.get(upgrade.ability_id, "")
         res.append(
             Upgrade(
                 upgrade.upgrade_id,
@@ -92,9 +118,7 @@ def parse_upgrades(upgrades, abilities):
                 upgrade.vespene_cost,
                 upgrade.research_time,
                 ability.button_name,
-                ability.friendly_name.replace("Research", "")
-                .replace("Evolve", "")
-                .strip(),
+                _FRIENDLY_NAME_RE.sub("", ability.friendly_name).strip(),
                 pysc2_name,
             )
         )
@@ -108,16 +132,12 @@ def parse_upgrades2(
     res: list[Upgrade] = []
 
     _upgrade_map: dict[int, UpgradeData] = {u.ability_id: u for u in upgrades.values()}
+    # Only ever read from, so a single default can be shared by the missing entries
+    empty_upgrade = UpgradeData()
 
     for ability in abilities:
-        try:
-            pysc2_name = FUNCTIONS_BY_ID[ability.ability_id]
-        except KeyError:
-            pysc2_name = ""
-        try:
-            _upgrade = _upgrade_map[ability.ability_id]
-        except KeyError:
-            _upgrade = UpgradeData()
+        pysc2_name = FUNCTIONS_BY_ID.get(ability.ability_id, "")
+        _upgrade = _upgrade_map.get(ability.ability_id, empty_upgrade)
         res.append(
             Upgrade(
                 _upgrade.upgrade_id,
@@ -127,9 +147,7 @@ def parse_upgrades2(
                 _upgrade.vespene_cost,
                 _upgrade.research_time,
                 ability.button_name,
-                ability.friendly_name.replace("Research", "")
-                .replace("Evolve", "")
-                .strip(),
+                _FRIENDLY_NAME_RE.sub("", ability.friendly_name).strip(),
                 pysc2_name,
             )
         )
@@ -153,49 +171,84 @@ def parse_units(valid_units):
     return units
 
 
-def get_game_info(version: str) -> GameInfo:
-    """Return dataclass that contains game information"""
-    game = SC2Linux(version=version)
+def fetch_game_data(game) -> sc_pb.ResponseData:
+    """Launch the game and request the raw data tables"""
     create = make_creation_msg(game)
     interface = make_interface_opts()
     join = sc_pb.RequestJoinGame(
         options=interface, race=sc2_env.Race["protoss"], player_name="Mike Hunt"
     )
-
-    vinfo = game.version
-    game_info = GameInfo(f"{vinfo.game_version}.{vinfo.build_version}")
     with game.start(want_rgb=False, full_screen=False) as controller:
         controller.create_game(create)
         controller.join_game(join)
-        game_data = controller.data()
-        game_info.units = parse_units(
-            (
-                u
-                for u in game_data.unit_stats.values()
-                if u.name != "" and 0 < u.race < 4 and u.available and u.build_time > 0
-            )
-        )
+        game_data = controller.data_raw()
+        controller.quit()
+    return game_data
 
-        # game_info.upgrades = parse_upgrades(
-        #     (u for u in game_data.upgrades.values() if u.ability_id != 0),
-        #     game_data.abilities,
-        # )
-        def name_filter(a: AbilityData):
-            return any(a.friendly_name.startswith(s) for s in ["Research", "Evolve"])
 
-        game_info.upgrades = parse_upgrades2(
-            (a for a in game_data.abilities.values() if name_filter(a)),
-            game_data.upgrades,
+def get_game_info(version: str, cache_dir: Path | None = None) -> GameInfo:
+    """
+    Return dataclass that contains game information, the raw game data is cached
+    in cache_dir so that re-runs don't need to start the game again
+    """
+    game = SC2Linux(version=version)
+    vinfo = game.version
+    game_info = GameInfo(f"{vinfo.game_version}.{vinfo.build_version}")
+
+    cache_file = cache_dir / f"{version}.pb" if cache_dir is not None else None
+    if cache_file is not None and cache_file.exists():
+        raw_data = sc_pb.ResponseData.FromString(cache_file.read_bytes())
+    else:
+        raw_data = fetch_game_data(game)
+        if cache_file is not None:
+            cache_file.write_bytes(raw_data.SerializeToString())
+    game_data = static_data.StaticData(raw_data)
+
+    game_info.units = parse_units(
+        (
+            u
+            for u in game_data.unit_stats.values()
+            if u.name != "" and 0 < u.race < 4 and u.available and u.build_time > 0
         )
-        controller.quit()
+    )
+
+    # game_info.upgrades = parse_upgrades(
+    #     (u for u in game_data.upgrades.values() if u.ability_id != 0),
+    #     game_data.abilities,
+    # )
+    def name_filter(a: AbilityData):
+        return any(a.friendly_name.startswith(s) for s in ["Research", "Evolve"])
+
+    game_info.upgrades = parse_upgrades2(
+        (a for a in game_data.abilities.values() if name_filter(a)),
+        game_data.upgrades,
+    )
 
     return game_info
 
 
+def convert_version(
+    root: Path, version: str, cache_dir: Path | None
+) -> GameInfo | None:
+    """
+    Point PySC2 at the version's install and get its info, run in a worker.
+    Returns None if the game failed to launch so the other versions can finish.
+    """
+    print(f"CONVERTING {version}")
+    os.environ["SC2PATH"] = str(root / version)
+    try:
+        return get_game_info(version, cache_dir)
+    except (SC2LaunchError, ConnectError) as err:
+        print(f"Failed to launch {version}: {err}")
+        return None
+
+
 FLAGS = flags.FLAGS
 flags.DEFINE_string("root", "", "")
 flags.DEFINE_string("output", "", "")
 flags.DEFINE_spaceseplist("versions", [""], "")
+flags.DEFINE_string("cache", "", "Folder to cache the raw game data of each version")
+flags.DEFINE_integer("workers", 1, "Number of game versions to convert in parallel")
 
 
 def main(unused_argv):
@@ -210,15 +263,26 @@ def main(unused_argv):
 
     versions = FLAGS.versions if FLAGS.versions else [p.name for p in root.iterdir()]
 
+    cache_dir = Path(FLAGS.cache) if FLAGS.cache else None
+    if cache_dir is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # Each version is a separate game instance, so they can be run side by side
     game_infos: list[GameInfo] = []
-    for idx, version in enumerate(versions, 1):
-        print(f"CONVERTING {version}")
-        os.environ["SC2PATH"] = str(root / version)
-        game_infos.append(get_game_info(version))
-        print(f"Finished {idx} of {len(versions)} game versions")
+    with ProcessPoolExecutor(max_workers=FLAGS.workers) as executor:
+        n_versions = len(versions)
+        results = executor.map(
+            convert_version, [root] * n_versions, versions, [cache_dir] * n_versions
+        )
+        for idx, game_info in enumerate(results, 1):
+            if game_info is not None:
+                game_infos.append(game_info)
+            print(f"Finished {idx} of {n_versions} game versions")
 
     with open(output, "w", encoding="utf-8") as f:
-        yaml.dump([asdict(g) for g in game_infos], f)
+        # Only plain python types are written, so use the C emitter when available
+        dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+        yaml.dump([game_info_to_dict(g) for g in game_infos], f, Dumper=dumper)
 
 
 if __name__ == "__main__":
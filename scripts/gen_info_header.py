@@ -10,6 +10,7 @@ https://starcraft.fandom.com/wiki/Vespene_gas
 https://starcraft.fandom.com/wiki/Minerals
 """
 from pathlib import Path
+from typing import Optional
 
 from sc2_replay_reader import upgrade_map
 from pysc2.lib.units import Neutral, Protoss, Terran, Zerg
@@ -29,71 +30,102 @@ def make_default_resources():
     return resource_mapping
 
 
-def add_unit_mapping(content: str):
+def add_constant(header: list[str], source: list[str], declaration: str, value: str):
+    """Declare the constant in the header and define it once in the source"""
+    header.append(f"extern const {declaration};\n")
+    source.append(f"const {declaration} = {value};\n")
+
+
+def add_comment(header: list[str], source: list[str], comment: str):
+    """Add the same section comment to the header and source"""
+    header.append(f"\n// {comment}\n")
+    source.append(f"\n// {comment}\n")
+
+
+def add_unit_mapping(header: list[str], source: list[str]):
     """Add sets to check belongings to groups"""
-    content += "\n// Sets to check that a typeid belongs to a race\n"
+    add_comment(header, source, "Sets to check that a typeid belongs to a race")
     for race in [Neutral, Protoss, Terran, Zerg]:
-        content += (
-            f"const static std::unordered_set<int> {race.__name__.lower()}"
-            f"UnitTypes = {{ {', '.join([str(e.value) for e in race])} }};\n"
+        add_constant(
+            header,
+            source,
+            f"std::unordered_set<int> {race.__name__.lower()}UnitTypes",
+            f"{{ {', '.join([str(e.value) for e in race])} }}",
         )
-    return content
 
 
-def add_resource_mapping(content: str):
+def add_resource_mapping(header: list[str], source: list[str]):
     """Add mapping from type id to default resource quantity"""
-    content += "\n// Default vespene or minerals from each resource type id\n"
-    content += "const static std::unordered_map<int, int> defaultResources = { "
-    content += ", ".join([f"{{{t},{q}}}" for t, q in make_default_resources().items()])
-    content += " };\n"
-    return content
+    add_comment(
+        header, source, "Default vespene or minerals from each resource type id"
+    )
+    resources = ", ".join([f"{{{t},{q}}}" for t, q in make_default_resources().items()])
+    add_constant(
+        header,
+        source,
+        "std::unordered_map<int, int> defaultResources",
+        f"{{ {resources} }}",
+    )
 
 
-def add_research_grouping(content: str):
+def add_research_grouping(header: list[str], source: list[str]):
     """Add set to group research by race"""
-    content += "\n// Research for Each Race by Game Version\n"
-    content += (
-        "const static std::unordered_map<std::string, "
-        "std::unordered_map<Race, std::set<int>>> raceResearch = {\n"
-    )
+    add_comment(header, source, "Research for Each Race by Game Version")
+    value = ["{\n"]
     for version, data in upgrade_map.UPGRADE_INFO.items():
-        content += f'    {{"{version}",\n        {{\n'
+        value.append(f'    {{"{version}",\n        {{\n')
         for race in ["protoss", "terran", "zerg"]:
-            content += f"            {{ Race::{race.capitalize()}, {{ "
+            value.append(f"            {{ Race::{race.capitalize()}, {{ ")
             ids = sorted(getattr(data, race).keys())
-            content += ", ".join([str(_id) for _id in ids]) + " } },\n"
-        content += "        }\n    },\n"
-    content += "};\n"
-    return content
+            value.append(", ".join([str(_id) for _id in ids]) + " } },\n")
+        value.append("        }\n    },\n")
+    value.append("}")
+    add_constant(
+        header,
+        source,
+        "std::unordered_map<std::string, "
+        "std::unordered_map<Race, std::set<int>>> raceResearch",
+        "".join(value),
+    )
 
 
-def add_research_remapping(content: str):
+def add_research_remapping(header: list[str], source: list[str]):
     """Add reserarch action remapping from non-leveled to leveled action"""
-    content += "\n// Remap non-leveled research action to leveled research action\n"
-    content += (
-        "const static std::unordered_map<std::string, std::unordered_map<Race, "
-        "std::unordered_map<int, std::array<int, 3>>>> raceResearchReID = {\n"
+    add_comment(
+        header, source, "Remap non-leveled research action to leveled research action"
     )
+    value = ["{\n"]
     for version, data in upgrade_map.UPGRADE_INFO.items():
-        content += f'    {{"{version}",\n        {{\n'
+        value.append(f'    {{"{version}",\n        {{\n')
         for race in ["protoss", "terran", "zerg"]:
-            content += f"            {{ Race::{race.capitalize()}, {{ "
+            value.append(f"            {{ Race::{race.capitalize()}, {{ ")
             remappings = []
             for action, levels in getattr(data, f"{race}_lvl_remap").items():
                 remappings.append(
                     f"{{ {action}, {{{', '.join([str(l) for l in levels])}}} }}"
                 )
-            content += ", ".join(remappings)
-            content += " } },\n"
-        content += "        }\n    },\n"
-    content += "};\n"
-    return content
+            value.append(", ".join(remappings))
+            value.append(" } },\n")
+        value.append("        }\n    },\n")
+    value.append("}")
+    add_constant(
+        header,
+        source,
+        "std::unordered_map<std::string, std::unordered_map<Race, "
+        "std::unordered_map<int, std::array<int, 3>>>> raceResearchReID",
+        "".join(value),
+    )
 
 
 @app.command()
-def main(out_folder: Path = Path.cwd()):
-    """Generate C++ Game Info Header based on values from PySC2"""
-    content = r"""// ---- Generated by scripts/gen_info_header.py ----
+def main(out_folder: Path = Path.cwd(), src_folder: Optional[Path] = None):
+    """
+    Generate C++ Game Info based on values from PySC2. The header only declares
+    the constants so that the large initializers are only compiled once, in the
+    source file which is written to src_folder (defaults to out_folder).
+    """
+    header = [
+        r"""// ---- Generated by scripts/gen_info_header.py ----
 #pragma once
 #include "data.hpp"
 
@@ -105,18 +137,32 @@ def main(out_folder: Path = Path.cwd()):
 namespace cvt {
 // clang-format off
 """
-    content = add_unit_mapping(content)
-    content = add_resource_mapping(content)
-    content = add_research_grouping(content)
-    content = add_research_remapping(content)
+    ]
+    source = [
+        r"""// ---- Generated by scripts/gen_info_header.py ----
+#include "generated_info.hpp"
 
-    # Footer
-    content += "\n// clang-format on\n}// namespace cvt\n"
+namespace cvt {
+// clang-format off
+"""
+    ]
+    # Sections are appended to a list and joined once at the end
+    add_unit_mapping(header, source)
+    add_resource_mapping(header, source)
+    add_research_grouping(header, source)
+    add_research_remapping(header, source)
 
-    # Write file
-    out_path = out_folder / "generated_info.hpp"
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(content)
+    # Footer
+    for buf in [header, source]:
+        buf.append("\n// clang-format on\n}// namespace cvt\n")
+
+    # Write files
+    if src_folder is None:
+        src_folder = out_folder
+    with open(out_folder / "generated_info.hpp", "w", encoding="utf-8") as f:
+        f.write("".join(header))
+    with open(src_folder / "generated_info.cpp", "w", encoding="utf-8") as f:
+        f.write("".join(source))
 
 
 if __name__ == "__main__":
@@ -3,65 +3,154 @@
 Explore SC2Replays data with python API
 """
 # ruff: noqa
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from pathlib import Path
 from typing import Sequence
 
-import cv2
 import numpy as np
 import sc2_replay_reader
 import typer
 from typing_extensions import Annotated
-from matplotlib import pyplot as plt
-from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 from sc2_replay_reader.unit_features import Unit, UnitOH, NeutralUnit, NeutralUnitOH
 
 app = typer.Typer()
 
 
-def make_minimap_video(image_sequence: Sequence, fname: Path):
+class VideoCodec(str, Enum):
+    ffv1 = "ffv1"
+    mjpg = "mjpg"
+    vp9 = "vp9"
+    x264 = "x264"
+    nvenc = "nvenc"
+
+
+# FourCC and container of each codec, VP9 is much slower to encode than the others
+VIDEO_CODECS = {
+    VideoCodec.ffv1: ("FFV1", ".mkv"),
+    VideoCodec.mjpg: ("MJPG", ".avi"),
+    VideoCodec.vp9: ("VP90", ".webm"),
+}
+# Codecs encoded by piping frames to ffmpeg, x264 is multithreaded and nvenc is
+# on the GPU so encoding doesn't compete with drawing the frames
+FFMPEG_CODECS = {
+    VideoCodec.x264: (["-c:v", "libx264", "-preset", "ultrafast"], ".mp4"),
+    VideoCodec.nvenc: (["-c:v", "h264_nvenc", "-preset", "p1"], ".mp4"),
+}
+
+
+class FFmpegWriter:
+    """Write raw frames to an ffmpeg process, same interface as cv2.VideoWriter"""
+
+    def __init__(
+        self,
+        fname: Path,
+        codec_args: list[str],
+        fps: int,
+        size: tuple[int, int],
+        isColor: bool = True,
+    ):
+        # fmt: off
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24" if isColor else "gray",
+            "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-",
+            *codec_args, "-pix_fmt", "yuv420p", str(fname),
+        ]
+        # fmt: on
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def isOpened(self):
+        return self._proc.poll() is None
+
+    def write(self, frame: np.ndarray):
+        self._proc.stdin.write(np.ascontiguousarray(frame).data)
+
+    def release(self):
+        self._proc.stdin.close()
+        self._proc.wait()
+
+
+def open_video_writer(
+    fname: Path, codec: VideoCodec, size: tuple[int, int], isColor: bool = True
+):
+    """Open a 10fps video writer for the codec, the codec's suffix is added to fname"""
+    # Only imported by the commands that make videos
+    import cv2
+
+    if codec in FFMPEG_CODECS:
+        codec_args, suffix = FFMPEG_CODECS[codec]
+        return FFmpegWriter(fname.with_suffix(suffix), codec_args, 10, size, isColor)
+
+    fourcc, suffix = VIDEO_CODECS[codec]
+    return cv2.VideoWriter(
+        str(fname.with_suffix(suffix)),
+        cv2.VideoWriter_fourcc(*fourcc),
+        10,
+        size,
+        isColor=isColor,
+    )
+
+
+def make_minimap_video(
+    image_sequence: Sequence, fname: Path, codec: VideoCodec = VideoCodec.ffv1
+):
     """Make video from image sequence"""
+    # Only imported by the commands that make videos
+    import cv2
+
     image = image_sequence[0]
-    writer = cv2.VideoWriter(
-        str(fname), cv2.VideoWriter_fourcc(*"VP90"), 10, image.shape, isColor=False
-    )
+    # Writers take (width, height) while shape is (height, width)
+    writer = open_video_writer(fname, codec, image.shape[::-1], isColor=False)
     assert writer.isOpened(), f"Failed to open {fname}"
+
+    # Scale by the range of the whole sequence so the frames are consistent with
+    # each other, found in a first pass so the frames aren't all held in memory
+    low, high = float("inf"), float("-inf")
     for image in image_sequence:
-        writer.write(
-            cv2.normalize(image.data, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
-        )
+        frame = image.data  # Accessing .data copies the image
+        low = min(low, float(frame.min()))
+        high = max(high, float(frame.max()))
+    alpha = 255.0 / (high - low) if high > low else 0.0
+    beta = -low * alpha
+    # Then each frame is a single scale and convert to uint8
+    for image in image_sequence:
+        writer.write(cv2.convertScaleAbs(image.data, alpha=alpha, beta=beta))
     writer.release()
 
 
-def make_units_video(parser: sc2_replay_reader.ReplayParser, fname: Path):
+def make_units_video(
+    parser: sc2_replay_reader.ReplayParser,
+    fname: Path,
+    codec: VideoCodec = VideoCodec.ffv1,
+):
+    # Only imported by the commands that make videos
+    import cv2
+
     img_w = 1920
     img_h = 1080
-    writer = cv2.VideoWriter(
-        str(fname), cv2.VideoWriter_fourcc(*"VP90"), 10, (img_w, img_h)
-    )
-    dpi = 200
-    fig_w = img_w / dpi
-    fig_h = img_h / dpi
-    fig, ax = plt.subplots(figsize=(fig_w, fig_h), dpi=dpi)
+    writer = open_video_writer(fname, codec, (img_w, img_h))
+    assert writer.isOpened(), f"Failed to open {fname}"
+    # Units are drawn straight onto the frame, map coordinates are scaled to
+    # pixels with y flipped so the origin is the bottom left like a plot
+    scale = np.array([img_w / parser.data.mapWidth, -img_h / parser.data.mapHeight])
+    offset = np.array([0, img_h])
+    frame = np.empty((img_h, img_w, 3), dtype=np.uint8)
+    alliance_colors = {  # BGR
+        UnitOH.alliance_self: (255, 0, 0),
+        UnitOH.alliance_enemy: (0, 0, 255),
+    }
 
     for tidx in range(parser.size()):
-        sample = parser.sample(tidx)
-        ax.clear()
-        ax.set_xlim(0, parser.data.mapWidth)
-        ax.set_ylim(0, parser.data.mapHeight)
-        unit_xy = sample["units"][:, [UnitOH.x, UnitOH.y]]
-        for a, c in zip([UnitOH.alliance_self, UnitOH.alliance_enemy], ["blue", "red"]):
-            unit_filt = unit_xy[sample["units"][:, a] == 1]
-            ax.scatter(unit_filt[:, 0], unit_filt[:, 1], c=c)
-        canvas = FigureCanvasAgg(fig)
-        canvas.draw()
-        rgb = np.frombuffer(canvas.tostring_rgb(), dtype=np.uint8).reshape(
-            canvas.get_width_height()[::-1] + (3,)
-        )
-        writer.write(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
-        if not writer.isOpened():
-            raise RuntimeError()
+        units = parser.sample(tidx)["units"]
+        unit_px = (units[:, [UnitOH.x, UnitOH.y]] * scale + offset).astype(np.int32)
+        frame.fill(255)
+        for alliance, color in alliance_colors.items():
+            for x, y in unit_px[units[:, alliance] == 1].tolist():
+                cv2.circle(frame, (x, y), 6, color, thickness=-1, lineType=cv2.LINE_AA)
+        writer.write(frame)
         print(f"Done {tidx+1}/{parser.size()}", end="\r")
     print("")
 
@@ -77,14 +166,13 @@ def test_parseable(db, idx, parser):
 @app.command()
 def count(folder: Annotated[Path, typer.Option(help="Folder to count replays")]):
     """Count number of replays in a set of shards"""
-    db = sc2_replay_reader.ReplayDatabase()
-    total = 0
-    for file in folder.iterdir():
-        if file.suffix == ".SC2Replays":
-            db.open(file)
-            print(f"found {db.size()} replays in {file.name}")
-            total += db.size()
-    print(f"Total replays: {total}")
+    files = sorted(f for f in folder.iterdir() if f.suffix == ".SC2Replays")
+    # Only the header of each shard is read, with the GIL released so they overlap
+    with ThreadPoolExecutor() as pool:
+        sizes = list(pool.map(sc2_replay_reader.ReplayDatabase.peekSize, files))
+    for file, size in zip(files, sizes):
+        print(f"found {size} replays in {file.name}")
+    print(f"Total replays: {sum(sizes)}")
 
 
 class SubCommand(str, Enum):
@@ -102,6 +190,9 @@ def inspect(
         Path, typer.Option(help="Directory to write data")
     ] = Path.cwd()
     / "workspace",
+    codec: Annotated[
+        VideoCodec, typer.Option(help="Video codec, vp9 is smallest but slowest")
+    ] = VideoCodec.ffv1,
 ):
     """"""
     db = sc2_replay_reader.ReplayDatabase(file)
@@ -114,7 +205,7 @@ def inspect(
 
     elif command is SubCommand.scatter_units:
         parser.parse_replay(db.getEntry(idx))
-        make_units_video(parser, outfolder / "raw_units1.webm")
+        make_units_video(parser, outfolder / "raw_units1", codec)
 
     elif command is SubCommand.minimap_video:
         # fmt: off
@@ -126,7 +217,7 @@ def inspect(
         replay_data = db.getEntry(idx)
         for attr in img_attrs:
             image_sequence = getattr(replay_data, attr)
-            make_minimap_video(image_sequence, outfolder / f"{attr}.webm")
+            make_minimap_video(image_sequence, outfolder / attr, codec)
 
 
 if __name__ == "__main__":
@@ -3,6 +3,9 @@
 Script that creates the partition files
 for running conversions in parallel.
 """
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dataclasses import dataclass, field
 from typing_extensions import Annotated
@@ -33,6 +36,7 @@ def main(
     folder: Annotated[Path, typer.Option(help="Path to folder of .SC2Replay files")],
     output: Annotated[Path, typer.Option(help="Folder to write the partition files")],
     num: Annotated[int, typer.Option(help="Number of partitions to generate")],
+    workers: Annotated[int, typer.Option(help="Threads used to stat the files")] = 32,
 ):
     """
     Read folder or SC2 Replay files and generate a set of files that
@@ -43,18 +47,24 @@ def main(
     if not output.exists():
         output.mkdir(parents=True)
 
-    all_files = list(
-        ReplayFile(f, f.stat().st_size)
-        for f in folder.iterdir()
-        if f.suffix == ".SC2Replay"
-    )
+    with os.scandir(folder) as it:
+        entries = [e for e in it if e.name.endswith(".SC2Replay")]
+    # Each stat is a syscall that releases the GIL, so threads overlap the round
+    # trips which dominate on network storage
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        sizes = pool.map(lambda e: e.stat().st_size, entries)
+        all_files = [ReplayFile(Path(e.path), s) for e, s in zip(entries, sizes)]
     print(f"Found {len(all_files)} files")
     all_files.sort(key=lambda x: x.size, reverse=True)
 
+    # Largest first onto the smallest partition, the heap is keyed by (size, index)
+    # so ties go to the lowest index, same as a linear min over the partitions
     parts = [Partition() for _ in range(num)]
+    heap = [(0, i) for i in range(num)]
     for file in all_files:
-        part = min(parts, key=lambda x: x.size)
-        part.append(file)
+        _, i = heapq.heappop(heap)
+        parts[i].append(file)
+        heapq.heappush(heap, (parts[i].size, i))
 
     for i, part in enumerate(parts):
         outpath = output / f"partition_{i}"
@@ -3,52 +3,54 @@ import shutil
 from pathlib import Path
 import typer
 
+from utils import table_exists
+
 app = typer.Typer()
 
 
 # Function to merge databases
-def merge_databases(source_db, target_db, table_name):
-    # Connect to the source database
-    source_conn = sqlite3.connect(source_db)
-    source_cursor = source_conn.cursor()
-
-    # Get column names from the source database
-    source_cursor.execute(f"PRAGMA table_info({table_name})")
-    columns = [column[1] for column in source_cursor.fetchall()]
-
-    # Connect to the target database and create the table if it doesn't exist
+def merge_databases(source_db, target_db, table_names):
+    """
+    Copy the rows of each table from source_db into target_db. The source is
+    attached to the target so the rows are copied within sqlite in one transaction
+    rather than fetched into python and inserted one at a time.
+    """
     target_conn = sqlite3.connect(target_db)
     target_cursor = target_conn.cursor()
-
-    # Generate the INSERT statement dynamically based on the columns
-    columns_str = ", ".join(columns)
-    placeholders_str = ", ".join(["?" for _ in columns])
-
-    insert_statement = (
-        f"INSERT INTO {table_name} " f"({columns_str}) " f"VALUES ({placeholders_str})"
-    )
-
-    # Fetch data from the source database
-    source_cursor.execute(f"SELECT * FROM {table_name}")
-    data_from_source = source_cursor.fetchall()
-
-    # Insert data into the target database
-    for row in data_from_source:
-        target_cursor.execute(insert_statement, row)
-
-    # Commit changes and close connections
-    target_conn.commit()
+    # Keep the rollback journal in memory rather than on disk, so a merge that fails
+    # part way (e.g. duplicate rows across shards) still rolls back cleanly
+    target_cursor.execute("PRAGMA journal_mode=MEMORY")
+    target_cursor.execute("PRAGMA synchronous=OFF")
+    target_cursor.execute("PRAGMA temp_store=MEMORY")
+    target_cursor.execute("ATTACH DATABASE ? AS src", (str(source_db),))
+
+    with target_conn:
+        for table_name in table_names:
+            # Databases made before failures were recorded have no game_failures
+            if not (
+                table_exists(target_cursor, table_name)
+                and table_exists(target_cursor, table_name, "src")
+            ):
+                print(f"Skipping {table_name}, not in both {source_db} and {target_db}")
+                continue
+            # Get column names from the source database
+            target_cursor.execute(f"PRAGMA src.table_info({table_name})")
+            columns_str = ", ".join(column[1] for column in target_cursor.fetchall())
+
+            target_cursor.execute(
+                f"INSERT INTO {table_name} ({columns_str}) "
+                f"SELECT {columns_str} FROM src.{table_name}"
+            )
+
+    target_cursor.execute("DETACH DATABASE src")
     target_cursor.close()
     target_conn.close()
 
-    source_cursor.close()
-    source_conn.close()
-
 
 @app.command()
 def main(database_directory: Path, target_database: Path):
-    # Assuming the table name is the same in all databases
-    table_name = "game_data"
+    # Assuming the table names are the same in all databases
+    table_names = ["game_data", "game_failures"]
 
     # Loop through all databases in the directory
     for idx, source_database in enumerate(database_directory.glob("*.db")):
@@ -56,7 +58,7 @@ def main(database_directory: Path, target_database: Path):
             shutil.copy(source_database, target_database)
             continue
         # Merge the databases
-        merge_databases(source_database, target_database, table_name)
+        merge_databases(source_database, target_database, table_names)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,10 @@
+from itertools import accumulate, groupby
+from operator import attrgetter
 from pathlib import Path
-from typing import Callable, Dict, Literal, Tuple
+from typing import Any, Callable, Dict, List, Literal, Tuple
 
-import torch
 from torch.utils.data import Dataset
-from utils import upper_bound
+from utils import prefetch_file, upper_bound
 from sc2_replay_reader import (
     GAME_INFO_FILE,
     ReplayDatabase,
@@ -13,7 +14,7 @@ from sc2_replay_reader import (
 )
 
 SQL_TYPES = Literal["INTEGER", "FLOAT", "TEXT", "BOOLEAN"]
-ENUM_KEYS = {"playerRace", "playerResult"}
+ENUM_KEYS = frozenset({"playerRace", "playerResult"})
 LambdaFunctionType = Callable[[ReplayParser], float | int]
 
 
@@ -23,12 +24,18 @@ class SC2Replay(Dataset):
         basepath: Path,
         features: set[str],
         lambda_columns: Dict[str, Tuple[SQL_TYPES, LambdaFunctionType]],
+        score_columns: Dict[str, str] | None = None,
     ) -> None:
         super().__init__()
-        self.features = features
+        self.features = tuple(features)
         self.db_handle = ReplayDatabase()
         self.parser = ReplayParser(GAME_INFO_FILE)
         self.lambda_columns = lambda_columns
+        # Mapping of column name to attribute of the final score of the replay
+        self.score_columns = score_columns if score_columns is not None else {}
+        self._score_getters = tuple(
+            (k, attrgetter(attr)) for k, attr in self.score_columns.items()
+        )
 
         setReplayDBLoggingLevel(spdlog_lvl.warn)
 
@@ -37,25 +44,64 @@ class SC2Replay(Dataset):
         else:
             self.replays = list(basepath.glob("*.SC2Replays"))
             assert len(self.replays) > 0, f"No .SC2Replays found in {basepath}"
+        self._partitions = [str(replay.name) for replay in self.replays]
 
-        replays_per_file = torch.empty([len(self.replays) + 1], dtype=torch.int)
-        replays_per_file[0] = 0
+        # Only the header of each shard is read to count its replays
+        replays_per_file = [0] * (len(self.replays) + 1)
         for idx, replay in enumerate(self.replays, start=1):
-            self.db_handle.open(replay)
-            replays_per_file[idx] = self.db_handle.size()
+            replays_per_file[idx] = ReplayDatabase.peekSize(replay)
 
-        self._accumulated_replays = torch.cumsum(replays_per_file, 0)
-        self.n_replays = int(self._accumulated_replays[-1].item())
+        # No shard is opened until a replay is read from it
+        self._opened_file_index = -1
+
+        # Plain list of ints so locating a replay is a bisect rather than a tensor op
+        self._accumulated_replays = list(accumulate(replays_per_file))
+        self.n_replays = self._accumulated_replays[-1]
         assert self.n_replays > 0, "No replays in dataset"
 
     def __len__(self) -> int:
         return self.n_replays
 
+    def _locate(self, index: int) -> Tuple[int, int]:
+        """Find the shard and the index within that shard of a replay"""
+        file_index = upper_bound(self._accumulated_replays, index)
+        db_index = index - self._accumulated_replays[file_index]
+        return file_index, db_index
+
+    def _open(self, file_index: int):
+        """Open a shard, skipped if it is already open as that reloads its index"""
+        if file_index != self._opened_file_index:
+            if not self.db_handle.open(self.replays[file_index]):
+                raise RuntimeError(f"Failed to open {self.replays[file_index]}")
+            self._opened_file_index = file_index
+            # Replays are usually read in order, so start reading the next shard
+            # in the background while this one is parsed
+            if file_index + 1 < len(self.replays):
+                prefetch_file(self.replays[file_index + 1])
+
     # @profile
     def __getitem__(self, index: int):
-        file_index = upper_bound(self._accumulated_replays, index)
-        self.db_handle.open(self.replays[file_index])
-        db_index = index - int(self._accumulated_replays[file_index].item())
+        file_index, db_index = self._locate(index)
+        self._open(file_index)
+        return self._read_replay(file_index, db_index)
+
+    def __getitems__(self, indices: List[int]):
+        """
+        Batched fetch used by the DataLoader, each shard is only opened once
+        and the samples are returned in the same order as indices.
+        """
+        locations = [self._locate(index) for index in indices]
+        order = sorted(range(len(indices)), key=lambda i: locations[i][0])
+
+        samples: List[Dict[str, Any] | None] = [None] * len(indices)
+        for file_index, group in groupby(order, key=lambda i: locations[i][0]):
+            self._open(file_index)
+            for i in group:
+                samples[i] = self._read_replay(*locations[i])
+        return samples
+
+    def _read_replay(self, file_index: int, db_index: int):
+        """Parse a replay from the currently opened shard"""
         assert (  # This should hold if calculation checks out
             db_index < self.db_handle.size()
         ), f"{db_index} exceeds {self.db_handle.size()}"
@@ -64,7 +110,7 @@ class SC2Replay(Dataset):
             self.parser.parse_replay(self.db_handle.getEntry(db_index))
         except MemoryError:
             data = {
-                "partition": str(self.replays[file_index].name),
+                "partition": self._partitions[file_index],
                 "idx": db_index,
                 "read_success": False,
             }
@@ -77,18 +123,27 @@ class SC2Replay(Dataset):
 
             return data
 
-        data = {p: getattr(self.parser.data, p, None) for p in self.features}
-        data = {k: int(v) if k in ENUM_KEYS else v for k, v in data.items()}
+        data = {
+            "partition": self._partitions[file_index],
+            "idx": db_index,
+            "read_success": True,
+        }
+        # Fill the sample in a single pass, converting the enums as they are read
+        replay_data = self.parser.data
+        for p in self.features:
+            value = getattr(replay_data, p, None)
+            data[p] = int(value) if p in ENUM_KEYS else value
 
         for k, (_, f) in self.lambda_columns.items():
             data[k] = f(self.parser)
 
-        return {
-            "partition": str(self.replays[file_index].name),
-            "idx": db_index,
-            "read_success": True,
-            **data,
-        }
+        if self._score_getters:
+            # Accessing data.score converts the whole vector, so only do it once
+            final_score = self.parser.data.score[-1]
+            for k, getter in self._score_getters:
+                data[k] = float(getter(final_score))
+
+        return data
 
     def __iter__(self):
         for index in range(len(self)):
@@ -1,9 +1,36 @@
-import torch
-from torch import Tensor
+import os
+import sqlite3
+from bisect import bisect_right
+from pathlib import Path
+from typing import Sequence
 
 
-def upper_bound(x: Tensor, value: float) -> int:
+def upper_bound(x: Sequence[float], value: float) -> int:
     """
     Find the index of the last element which is less or equal to value
     """
-    return int(torch.argwhere(torch.le(x, value))[-1].item())
+    return bisect_right(x, value) - 1
+
+
+def prefetch_file(path: Path, length: int = 16 << 20) -> None:
+    """
+    Ask the kernel to start reading the head of a file into the page cache, this
+    returns immediately and is a no-op where posix_fadvise isn't available. The
+    default length covers a shard's look up table of 1M 16 byte std::streampos.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, length, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+
+def table_exists(cursor: sqlite3.Cursor, name: str, schema: str = "main") -> bool:
+    """Check if a table exists in a database, schema is the name it is attached as"""
+    cursor.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?",
+        (name,),
+    )
+    return cursor.fetchone() is not None
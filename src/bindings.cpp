@@ -288,6 +288,10 @@ PYBIND11_MODULE(_sc2_replay_reader, m)
         .def("open", &cvt::ReplayDatabase::open, py::arg("dbPath"))
         .def("isFull", &cvt::ReplayDatabase::isFull)
         .def("size", &cvt::ReplayDatabase::size)
+        .def_static("peekSize",
+            &cvt::ReplayDatabase::peekSize,
+            py::arg("dbPath"),
+            py::call_guard<py::gil_scoped_release>())
         .def("getEntry", &cvt::ReplayDatabase::getEntry, py::arg("index"))
         .def("getHashIdEntry", &cvt::ReplayDatabase::getHashId, py::arg("index"));
 
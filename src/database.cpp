@@ -74,6 +74,19 @@ auto ReplayDatabase::isFull() const noexcept -> bool { return entryPtr_.size() >
 
 auto ReplayDatabase::size() const noexcept -> std::size_t { return entryPtr_.size(); }
 
+auto ReplayDatabase::peekSize(const std::filesystem::path &dbPath) noexcept -> std::size_t
+{
+    // The entry count is the first field of the file, ahead of the look up table
+    std::size_t nEntries = 0;
+    std::ifstream dbStream(dbPath, std::ios::binary);
+    deserialize(nEntries, dbStream);
+    if (!dbStream) {
+        SPDLOG_LOGGER_ERROR(gLogger, "Failed to read size of database {}", dbPath.string());
+        return 0;
+    }
+    return nEntries;
+}
+
 auto ReplayDatabase::getHashes() const noexcept -> std::unordered_set<std::string>
 {
     std::unordered_set<std::string> replayHashes{};
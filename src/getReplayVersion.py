@@ -10,12 +10,17 @@ def get_replay_data(replay_path: str):
         return f.read()
 
 
+def read_metadata(replay_data: bytes):
+    """Decompress and parse only the game metadata from the replay archive"""
+    archive = mpyq.MPQArchive(io.BytesIO(replay_data), listfile=False)
+    metadata = archive.read_file(b"replay.gamemetadata.json")
+    if metadata is None:
+        raise KeyError("replay.gamemetadata.json")
+    return json.loads(metadata.decode("utf-8"))
+
+
 def get_replay_version(replay_data: bytes):
-    replay_io = io.BytesIO()
-    replay_io.write(replay_data)
-    replay_io.seek(0)
-    archive = mpyq.MPQArchive(replay_io).extract()
-    metadata = json.loads(archive[b"replay.gamemetadata.json"].decode("utf-8"))
+    metadata = read_metadata(replay_data)
     game_version = ".".join(metadata["GameVersion"].split(".")[:-1])
     data_version = metadata.get("DataVersion")  # Only in replays version 4.1+.
     build_version = str(metadata["BaseBuild"][4:])
@@ -25,11 +30,7 @@ def get_replay_version(replay_data: bytes):
 
 def get_all_versions(replay_data: bytes):
     try:
-        replay_io = io.BytesIO()
-        replay_io.write(replay_data)
-        replay_io.seek(0)
-        archive = mpyq.MPQArchive(replay_io).extract()
-        metadata = json.loads(archive[b"replay.gamemetadata.json"].decode("utf-8"))
+        metadata = read_metadata(replay_data)
         game_version = ".".join(metadata["GameVersion"].split(".")[:-1])
         data_version = metadata.get("DataVersion")  # Only in replays version 4.1+.
         build_version = int(metadata["BaseBuild"][4:])
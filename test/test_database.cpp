@@ -153,6 +153,21 @@ TEST_F(DatabaseTest, LoadDB)
     for (std::size_t i = 0; i < replayDb_.size(); ++i) { ASSERT_EQ(replayDb_.getEntry(i), loadDB.getEntry(i)); }
 }
 
+TEST_F(DatabaseTest, PeekSize)
+{
+    ASSERT_EQ(cvt::ReplayDatabase::peekSize(dbPath_), replayDb_.size());
+
+    fs::path tempPath = "testdb2.sc2db";
+    // Remove if it already exists
+    if (fs::exists(tempPath)) { fs::remove(tempPath); }
+    ASSERT_EQ(cvt::ReplayDatabase::peekSize(tempPath), 0);
+
+    // Empty file has no header to read
+    { std::ofstream emptyFile(tempPath, std::ios::binary); }
+    ASSERT_EQ(cvt::ReplayDatabase::peekSize(tempPath), 0);
+    fs::remove(tempPath);
+}
+
 namespace cvt {
 
 template<typename Sink> void AbslStringify(Sink &sink, Unit unit) { absl::Format(&sink, "%s", std::string(unit)); }